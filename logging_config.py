@@ -9,23 +9,78 @@ This module provides a centralized logging setup with support for:
 - Configurable formatters
 """
 
+import atexit
+import functools
 import logging
 import logging.handlers
 import json
+import locale
 import os
+import queue
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any
 
+try:
+    import msgspec
+except ImportError:  # msgspec is optional; fall back to orjson or the stdlib
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+if msgspec is not None:
+    class _JsonLogRecord(msgspec.Struct, omit_defaults=True):
+        """Fixed fields of a JSON log line, encoded without building a dict."""
+        timestamp: str
+        level: str
+        logger: str
+        message: str
+        module: str
+        function: Optional[str]
+        line: int
+        exception: Optional[str] = None
+
+    # One reusable encoder; msgspec encoders are safe to share across calls
+    _MSGSPEC_ENCODER = msgspec.json.Encoder()
+
 
 class JsonFormatter(logging.Formatter):
     """Custom JSON formatter for structured logging."""
     
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
+        # Build the ISO 8601 string directly rather than via a datetime object,
+        # and hand the same string to every encoder so the output never
+        # depends on which one is installed (theirs drop zero microseconds)
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+        timestamp += f".{int(record.created % 1 * 1_000_000):06d}"
+        
+        # Add exception info if present
+        exception = self.formatException(record.exc_info) if record.exc_info else None
+        extra_data = getattr(record, 'extra_data', None)
+        
+        # Records without extra fields match the fixed schema exactly
+        if msgspec is not None and extra_data is None:
+            log_record = _JsonLogRecord(
+                timestamp=timestamp,
+                level=record.levelname,
+                logger=record.name,
+                message=record.getMessage(),
+                module=record.module,
+                function=record.funcName,
+                line=record.lineno,
+                exception=exception
+            )
+            return _MSGSPEC_ENCODER.encode(log_record).decode('utf-8')
+        
         log_data = {
-            'timestamp': datetime.fromtimestamp(record.created).isoformat(),
+            'timestamp': timestamp,
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -33,18 +88,24 @@ class JsonFormatter(logging.Formatter):
             'function': record.funcName,
             'line': record.lineno
         }
-        
-        # Add exception info if present
-        if record.exc_info:
-            log_data['exception'] = self.formatException(record.exc_info)
+        if exception is not None:
+            log_data['exception'] = exception
         
         # Add extra fields if present
-        if hasattr(record, 'extra_data'):
-            log_data.update(record.extra_data)
-            
+        if extra_data is not None:
+            log_data.update(extra_data)
+
+        if msgspec is not None:
+            return _MSGSPEC_ENCODER.encode(log_data).decode('utf-8')
+        if orjson is not None:
+            return orjson.dumps(log_data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
         return json.dumps(log_data, ensure_ascii=False)
 
 
+class _RecordView:
+    """Bare attribute holder that formatter styles can read like a LogRecord."""
+
+
 class ColoredConsoleFormatter(logging.Formatter):
     """Console formatter with color support."""
     
@@ -58,26 +119,159 @@ class ColoredConsoleFormatter(logging.Formatter):
         'RESET': '\033[0m'        # Reset
     }
     
-    def format(self, record: logging.LogRecord) -> str:
-        """Format log record with colors for console output."""
-        # Add color to level name
-        level_color = self.COLORS.get(record.levelname, '')
+    def __init__(self, *args: Any, use_color: bool = True, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.use_color = use_color
+        # Build the colored level names once instead of on every record
         reset_color = self.COLORS['RESET']
+        self._colored = {
+            level: f"{color}{level}{reset_color}"
+            for level, color in self.COLORS.items() if level != 'RESET'
+        }
+    
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        """Format the log line with a colored level name for console output."""
+        colored_level = self._colored.get(record.levelname) if self.use_color else None
+        if colored_level is None:
+            return super().formatMessage(record)
         
-        # Create colored level name
-        colored_level = f"{level_color}{record.levelname}{reset_color}"
-        
-        # Replace the original levelname temporarily
-        original_levelname = record.levelname
-        record.levelname = colored_level
-        
-        # Format the message
-        formatted = super().format(record)
-        
-        # Restore original levelname
-        record.levelname = original_levelname
+        # The record is shared with other handlers (and threads), so never
+        # write to it: format from a copy of its attributes instead.
+        values = record.__dict__.copy()
+        values['levelname'] = colored_level
+        view = _RecordView()
+        view.__dict__ = values
+        return self._style.format(view)
+
+
+class InProcessQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler for a listener that lives in the same process."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Pass the record through untouched.
         
-        return formatted
+        The stdlib implementation pre-formats the message and strips exc_info
+        so records can be pickled. Ours never leave the process, so the real
+        formatters on the listener thread need the original record.
+        """
+        return record
+
+
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler that coalesces writes into a large buffer.
+    
+    StreamHandler flushes after every record, which costs one write() syscall
+    per log line. This handler opens the file with a bigger buffer and only
+    flushes eagerly for records at or above flush_level; everything else is
+    written out when the buffer fills, on rollover, or on close/shutdown.
+    
+    It also keeps a running count of encoded bytes written so the rollover
+    check is an integer compare instead of a seek/tell per record.
+    """
+    
+    def __init__(
+        self,
+        filename: str,
+        buffer_size: int = 64 * 1024,
+        flush_level: int = logging.WARNING,
+        **kwargs: Any
+    ):
+        self.buffer_size = buffer_size
+        self.flush_level = flush_level
+        self._defer_flush = False
+        self._pending_bytes = 0
+        super().__init__(filename, **kwargs)
+        # maxBytes counts encoded bytes, so measure records the same way
+        encoding = self.encoding
+        if encoding is None or encoding == 'locale':
+            encoding = locale.getpreferredencoding(False)
+        self._byte_encoding = encoding
+        self._bytes_written = (
+            os.path.getsize(self.baseFilename)
+            if os.path.exists(self.baseFilename) else 0
+        )
+    
+    def _open(self):
+        """Open the log file with the configured buffer size."""
+        return self._builtin_open(
+            self.baseFilename, self.mode,
+            buffering=self.buffer_size,
+            encoding=self.encoding, errors=self.errors
+        )
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        """Decide rollover from the running byte count."""
+        if self.maxBytes <= 0:
+            return False
+        msg = self.format(record) + self.terminator
+        self._pending_bytes = len(msg.encode(self._byte_encoding, self.errors or 'strict'))
+        if self._bytes_written + self._pending_bytes < self.maxBytes:
+            return False
+        # The stock check compares characters, not bytes, so it can't be used
+        # as the fallback; only its guard against non-regular files is kept.
+        if os.path.exists(self.baseFilename) and not os.path.isfile(self.baseFilename):
+            return False
+        return True
+    
+    def doRollover(self) -> None:
+        """Roll over and reset the running byte count."""
+        super().doRollover()
+        self._bytes_written = 0
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        """Emit a record, skipping the trailing flush for low-severity records."""
+        # emit() runs under the handler lock, so the flags can't be raced
+        self._defer_flush = record.levelno < self.flush_level
+        self._pending_bytes = 0
+        try:
+            super().emit(record)
+            self._bytes_written += self._pending_bytes
+        finally:
+            self._defer_flush = False
+    
+    def flush(self) -> None:
+        """Flush the stream unless called from a deferred emit()."""
+        if not self._defer_flush:
+            super().flush()
+
+
+@functools.lru_cache(maxsize=None)
+def _level_number(log_level: str) -> int:
+    """Convert a level name to its logging constant, defaulting to INFO."""
+    return getattr(logging, log_level.upper(), logging.INFO)
+
+
+@functools.lru_cache(maxsize=8)
+def _make_formatter(fmt: str, datefmt: str, json_format: bool) -> logging.Formatter:
+    """
+    Build (and memoize) a file formatter.
+    
+    Formatters hold no per-record state, so repeated setup_logging calls can
+    share one instance instead of re-parsing the format string each time.
+    """
+    if json_format:
+        return JsonFormatter()
+    return logging.Formatter(fmt, datefmt=datefmt)
+
+
+def _should_use_color(stream: Any) -> bool:
+    """Check whether ANSI colors should be written to a stream."""
+    if os.environ.get('NO_COLOR') is not None or os.environ.get('TERM') == 'dumb':
+        return False
+    isatty = getattr(stream, 'isatty', None)
+    return bool(isatty and isatty())
+
+
+def _stop_listener(logger: logging.Logger) -> None:
+    """Stop the background QueueListener attached to a logger, if any."""
+    listener = getattr(logger, '_listener', None)
+    if listener is None:
+        return
+    atexit.unregister(listener.stop)
+    listener.stop()
+    logger._listener = None
 
 
 def setup_logging(
@@ -99,32 +293,39 @@ def setup_logging(
         json_format: If True, use JSON formatting for file logs
         console_output: If True, also output logs to console
     
+    Records are handed to a QueueListener thread that owns the console and
+    file handlers, so logging calls from worker threads never block on I/O.
+    
     Returns:
         Configured logger instance
     """
     # Convert string level to logging constant
-    numeric_level = getattr(logging, log_level.upper(), logging.INFO)
+    numeric_level = _level_number(log_level)
     
     # Create main logger
     logger = logging.getLogger('prmptr')
     logger.setLevel(numeric_level)
     
-    # Clear any existing handlers
+    # Clear any existing handlers (and the listener thread that feeds them)
+    _stop_listener(logger)
     logger.handlers.clear()
+    handlers = []
     
     # Console handler setup
     if console_output:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(numeric_level)
         
-        # Use colored formatter for console
+        # Use colored formatter for console, unless output is piped/redirected
+        # or the user opted out via NO_COLOR / TERM=dumb
         console_format = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
         console_formatter = ColoredConsoleFormatter(
             console_format,
-            datefmt='%Y-%m-%d %H:%M:%S'
+            datefmt='%Y-%m-%d %H:%M:%S',
+            use_color=_should_use_color(sys.stdout)
         )
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
     # File handler setup
     if log_file is None:
@@ -136,8 +337,9 @@ def setup_logging(
     log_path = Path(log_file)
     log_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Use rotating file handler for automatic log rotation
-    file_handler = logging.handlers.RotatingFileHandler(
+    # Use rotating file handler for automatic log rotation; writes are
+    # buffered and only flushed eagerly for WARNING and above
+    file_handler = BufferedRotatingFileHandler(
         log_file,
         maxBytes=max_file_size,
         backupCount=backup_count,
@@ -146,17 +348,23 @@ def setup_logging(
     file_handler.setLevel(numeric_level)
     
     # Choose formatter based on json_format flag
-    if json_format:
-        file_formatter = JsonFormatter()
-    else:
-        file_format = '%(asctime)s - %(levelname)s - %(name)s - %(module)s:%(funcName)s:%(lineno)d - %(message)s'
-        file_formatter = logging.Formatter(
-            file_format,
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+    file_format = '%(asctime)s - %(levelname)s - %(name)s - %(module)s:%(funcName)s:%(lineno)d - %(message)s'
+    file_formatter = _make_formatter(file_format, '%Y-%m-%d %H:%M:%S', json_format)
     
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    handlers.append(file_handler)
+    
+    # Route records through a queue; the listener thread does the actual writes
+    log_queue = queue.Queue(-1)
+    logger.addHandler(InProcessQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    logger._listener = listener
+    
+    # Make sure queued records are flushed on interpreter shutdown
+    atexit.register(listener.stop)
     
     return logger
 
@@ -174,6 +382,21 @@ def get_logger(name: str = 'prmptr') -> logging.Logger:
     return logging.getLogger(name)
 
 
+def flush_logging(logger: logging.Logger) -> None:
+    """
+    Block until the background listener has handled every queued record.
+    
+    Useful before printing directly to the console so the output doesn't
+    interleave with log lines still waiting in the queue.
+    
+    Args:
+        logger: Logger configured by setup_logging
+    """
+    listener = getattr(logger, '_listener', None)
+    if listener is not None:
+        listener.queue.join()
+
+
 def log_with_extra(logger: logging.Logger, level: int, message: str, **extra_data: Any) -> None:
     """
     Log a message with additional structured data.
@@ -184,12 +407,11 @@ def log_with_extra(logger: logging.Logger, level: int, message: str, **extra_dat
         message: Log message
         **extra_data: Additional data to include in structured logs
     """
-    # Create a LogRecord with extra data
-    record = logger.makeRecord(
-        logger.name, level, "", 0, message, (), None
-    )
-    record.extra_data = extra_data
-    logger.handle(record)
+    # Bail out before building a record if the level is filtered anyway
+    if not logger.isEnabledFor(level):
+        return
+    # stacklevel=2 attributes the record to our caller rather than this helper
+    logger.log(level, message, extra={'extra_data': extra_data}, stacklevel=2)
 
 
 def cleanup_old_logs(log_directory: str = ".", max_age_days: int = 30) -> None:
@@ -200,20 +422,27 @@ def cleanup_old_logs(log_directory: str = ".", max_age_days: int = 30) -> None:
         log_directory: Directory containing log files
         max_age_days: Maximum age of log files to keep (in days)
     """
-    log_dir = Path(log_directory)
-    if not log_dir.exists():
-        return
-    
     cutoff_time = datetime.now().timestamp() - (max_age_days * 24 * 60 * 60)
+    logger = get_logger()
+    
+    try:
+        entries = os.scandir(log_directory)
+    except FileNotFoundError:
+        return
     
-    # Find and remove old log files
-    for log_file in log_dir.glob("*.log*"):
-        if log_file.stat().st_mtime < cutoff_time:
+    # Find and remove old log files (same match as the glob "*.log*"). scandir
+    # hands back DirEntry objects whose type/stat info comes from the
+    # directory read itself, so most files cost no extra syscalls.
+    with entries:
+        for entry in entries:
+            if '.log' not in entry.name:
+                continue
             try:
-                log_file.unlink()
-                print(f"Cleaned up old log file: {log_file}")
+                if entry.is_file() and entry.stat().st_mtime < cutoff_time:
+                    os.unlink(entry.path)
+                    logger.info("Cleaned up old log file: %s", entry.path)
             except OSError as e:
-                print(f"Failed to remove old log file {log_file}: {e}")
+                logger.warning("Failed to remove old log file %s: %s", entry.path, e)
 
 
 # Convenience functions for different log levels
@@ -1,30 +1,83 @@
 # prmptr.py
 import os
 import argparse
+import functools
+import hashlib
+import importlib.util
+import logging
+import mmap
+import pickle
+import re
 import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List
 import asyncio
-import concurrent.futures
 from collections import defaultdict
 import multiprocessing
 
-from openai import OpenAI
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 from utils import (
     INPUT_NODE_NAME,
-    parse_prompt_file,
-    build_dependency_graph,
-    resolve_execution_order,
-    find_parallel_groups,
+    PLACEHOLDER_RE,
+    parse_prompt_chain,
+    analyze,
+    group_by_depth,
 )
-from logging_config import setup_logging, get_logger, log_with_extra, cleanup_old_logs
+from logging_config import setup_logging, get_logger, log_with_extra, cleanup_old_logs, flush_logging
 
 # --- Configuration ---
 # Using constants makes the code cleaner and easier to modify.
 MODEL_NAME = "gpt-4o-mini"
 SYSTEM_PROMPT = "You are a helpful assistant. Please follow the instructions exactly."
 
+# HTTP/2 lets concurrent requests share one connection, but needs the optional
+# 'h2' package (pip install "httpx[http2]").
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# Matches the OpenAI SDK's default: generous read timeout, quick connect timeout.
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+
+# Parsed prompt chains are cached here, keyed by a hash of the prompt file and
+# of the parser's source, so changes to utils.py invalidate entries on their
+# own. Bump PLAN_CACHE_VERSION only if the cached tuple itself changes shape.
+# Only the PLAN_CACHE_MAX_ENTRIES most recently used entries are kept.
+PLAN_CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "prmptr"
+PLAN_CACHE_VERSION = 3
+PLAN_CACHE_MAX_ENTRIES = 64
+
+# Files at least this large are memory-mapped instead of read into a buffer.
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# Separator placed between steps in the execution log.
+LOG_SEPARATOR = "\n\n====================\n\n"
+
+
+class _MissingDependency(Exception):
+    """Raised from inside re.sub to abort substitution on an unresolved dependency."""
+
+
+def build_http_client(max_connections: int, asynchronous: bool = False) -> httpx.Client | httpx.AsyncClient:
+    """
+    Creates a shared HTTP client with a connection pool sized for the workload.
+
+    Args:
+        max_connections: How many requests may be in flight at once.
+        asynchronous: If True, build an httpx.AsyncClient for AsyncOpenAI.
+
+    Returns:
+        An httpx client to pass to the OpenAI SDK as http_client. Built from
+        the SDK's own client classes so its other defaults (redirects, etc.)
+        still apply.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+    )
+    client_class = DefaultAsyncHttpxClient if asynchronous else DefaultHttpxClient
+    return client_class(http2=HTTP2_AVAILABLE, limits=limits, timeout=HTTP_TIMEOUT)
+
 
 def call_llm(client: OpenAI, prompt: str) -> str | None:
     """
@@ -50,130 +103,314 @@ def call_llm(client: OpenAI, prompt: str) -> str | None:
         logger.info("LLM response received", extra={'response_length': len(response_content)})
         return response_content
     except Exception as e:
-        logger.error(f"An error occurred while calling the API: {e}", exc_info=True)
+        logger.error("An error occurred while calling the API: %s", e, exc_info=True)
         return None
 
 
-def execute_prompt_chain_parallel(
-    client: OpenAI,
+async def call_llm_async(client: AsyncOpenAI, prompt: str) -> str | None:
+    """
+    Async counterpart of call_llm, used by the parallel executor.
+
+    Args:
+        client: The configured AsyncOpenAI client instance.
+        prompt: The complete prompt to send to the model.
+
+    Returns:
+        The text content from the AI's response, or None if an error occurs.
+    """
+    try:
+        logger.info("Sending prompt to LLM...", extra={'model': MODEL_NAME, 'prompt_length': len(prompt)})
+        response = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+        )
+        response_content = response.choices[0].message.content.strip()
+        logger.info("LLM response received", extra={'response_length': len(response_content)})
+        return response_content
+    except Exception as e:
+        logger.error("An error occurred while calling the API: %s", e, exc_info=True)
+        return None
+
+
+def read_text_file(path: Path) -> str:
+    """
+    Reads a UTF-8 text file, decoding it in one pass from a single buffer.
+
+    Large files are memory-mapped so the decode reads straight from the page
+    cache. Line endings are normalized to LF, just like Path.read_text.
+
+    Args:
+        path: The file to read.
+
+    Returns:
+        The decoded file content.
+    """
+    with path.open('rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            content = f.read().decode('utf-8')
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                content = str(mm, 'utf-8')
+
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+
+@functools.lru_cache(maxsize=None)
+def _parser_digest() -> bytes:
+    """Hashes the source of the module that parses and analyzes prompt files."""
+    parser_source = Path(sys.modules[parse_prompt_chain.__module__].__file__)
+    return hashlib.blake2b(parser_source.read_bytes(), digest_size=16).digest()
+
+
+def _plan_cache_path(prompt_content: str) -> Path:
+    """Returns the cache file for a prompt file's parsed plan."""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"v{PLAN_CACHE_VERSION}:".encode('utf-8'))
+    hasher.update(_parser_digest())
+    hasher.update(prompt_content.encode('utf-8'))
+    return PLAN_CACHE_DIR / f"{hasher.hexdigest()}.pkl"
+
+
+def load_cached_plan(prompt_content: str) -> tuple | None:
+    """
+    Loads a previously parsed plan for this exact prompt file content.
+
+    Args:
+        prompt_content: The raw text of the prompt chain file.
+
+    Returns:
+        A (definitions, graph, execution_order, parallel_groups) tuple, or
+        None if there is no usable cache entry.
+    """
+    cache_path = _plan_cache_path(prompt_content)
+    try:
+        with cache_path.open('rb') as f:
+            plan = pickle.load(f)
+        # Mark the entry as recently used so pruning keeps it
+        os.utime(cache_path)
+        return plan
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable plan cache %s: %s", cache_path, e)
+        return None
+
+
+def save_cached_plan(prompt_content: str, plan: tuple) -> None:
+    """
+    Stores a parsed plan so later runs with the same prompt file can skip parsing.
+
+    Args:
+        prompt_content: The raw text of the prompt chain file.
+        plan: The (definitions, graph, execution_order, parallel_groups) tuple.
+    """
+    cache_path = _plan_cache_path(prompt_content)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so concurrent runs never see a partial entry
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open('wb') as f:
+            pickle.dump(plan, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        _prune_plan_cache()
+    except OSError as e:
+        logger.warning("Could not write plan cache %s: %s", cache_path, e)
+
+
+def _prune_plan_cache() -> None:
+    """Deletes all but the PLAN_CACHE_MAX_ENTRIES most recently used plans."""
+    entries = []
+    with os.scandir(PLAN_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith('.pkl'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    # Pruned by a concurrent run
+                    continue
+    if len(entries) <= PLAN_CACHE_MAX_ENTRIES:
+        return
+    entries.sort(reverse=True)
+    for _, path in entries[PLAN_CACHE_MAX_ENTRIES:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def render_execution_log(log_entries: List[tuple[str, str | None, str]]) -> str:
+    """
+    Builds the full execution log from the recorded steps in one join.
+
+    Args:
+        log_entries: (name, prompt, result) tuples in execution order. A prompt
+            of None marks a static variable whose content was used directly.
+
+    Returns:
+        The complete log text.
+    """
+    parts = []
+    for i, (name, prompt, result) in enumerate(log_entries):
+        if i:
+            parts.append(LOG_SEPARATOR)
+        if prompt is None:
+            parts += (
+                "--- Step: [[", name, "]] (Static) ---\n\n"
+                "CONTENT USED DIRECTLY:\n---\n", result, "\n---\n",
+            )
+        else:
+            parts += (
+                "--- Step: [[", name, "]] ---\n\n"
+                "PROMPT SENT TO LLM:\n---\n", prompt, "\n---\n\n"
+                "RESPONSE RECEIVED:\n---\n", result, "\n---\n",
+            )
+    return "".join(parts)
+
+
+def fill_template(name: str, template: str, resolved_values: Dict[str, str]) -> str | None:
+    """
+    Replaces every [[dependency]] placeholder in a template in a single pass.
+
+    Args:
+        name: The variable being resolved (used for error reporting).
+        template: The prompt template containing the placeholders.
+        resolved_values: The values resolved so far, keyed by variable name.
+            Variables that are not resolved yet may be absent or None.
+
+    Returns:
+        The filled-in prompt, or None if a dependency has no value yet.
+    """
+    def lookup(match: re.Match) -> str:
+        value = resolved_values.get(match.group(1))
+        if value is None:
+            raise _MissingDependency(match.group(1))
+        return value
+
+    try:
+        return PLACEHOLDER_RE.sub(lookup, template)
+    except _MissingDependency as e:
+        dep = e.args[0]
+        logger.error("Could not find value for dependency [[%s]]", dep, extra={'missing_dependency': dep, 'current_node': name})
+        return None
+
+
+async def execute_prompt_chain_parallel(
+    client: AsyncOpenAI,
     parallel_groups: List[List[str]],
     definitions: Dict[str, str],
-    graph: Dict[str, List[str]],
     initial_input: str,
+    statics: Dict[str, str],
     max_workers: int = None,
 ) -> tuple[str, str] | None:
     """
     Executes the planned prompt chain with parallel execution for independent prompts.
 
+    Prompts within a group run concurrently as coroutines on a single event
+    loop; groups themselves run one after another.
+
     Args:
-        client: The OpenAI client.
+        client: The async OpenAI client.
         parallel_groups: Groups of prompts that can be executed in parallel.
         definitions: The dictionary mapping variable names to their templates.
-        graph: The dependency graph for the prompts.
         initial_input: The initial text to start the chain with.
-        max_workers: Maximum number of worker threads. Defaults to 2x CPU cores.
+        statics: Variables without dependencies, mapped to their content. These
+            are resolved up front and never scheduled.
+        max_workers: Maximum number of concurrent LLM requests. Defaults to 2x CPU cores.
 
     Returns:
         A tuple containing the final output string and the full log string,
         or None if the process fails.
     """
-    resolved_values = {INPUT_NODE_NAME: initial_input}
+    # Presize with every known variable so later assignments never resize the dict
+    resolved_values = dict.fromkeys(definitions, None)
+    resolved_values[INPUT_NODE_NAME] = initial_input
     log_entries = []
+
+    # Static variables are known before any LLM call, so resolve them all at once
+    resolved_values.update(statics)
+    log_entries.extend((name, None, content) for name, content in statics.items())
     
     # Set default max_workers to 2x CPU cores if not specified
     if max_workers is None:
         max_workers = multiprocessing.cpu_count() * 2
         
-    logger.info(f"Using {max_workers} worker threads for parallel execution")
+    logger.info("Allowing up to %s concurrent requests for parallel execution", max_workers)
+    request_slots = asyncio.Semaphore(max_workers)
 
-    def process_single_prompt(name: str) -> tuple[str, str] | None:
+    async def process_single_prompt(name: str) -> tuple[str, str, str] | None:
         """Process a single prompt and return (name, result, log_entry) or None if failed."""
-        logger.info(f"Resolving prompt variable: [[{name}]]")
-        
-        template = definitions[name]
-        dependencies = graph.get(name, [])
-
-        # If a node has no dependencies, treat it as a static variable
-        if not dependencies:
-            logger.debug(f"Node '[[{name}]]' is static. Using its content directly.")
-            result = template
-            log_entry = (
-                f"--- Step: [[{name}]] (Static) ---\n\n"
-                f"CONTENT USED DIRECTLY:\n---\n{result}\n---\n"
-            )
-            return name, result, log_entry
+        logger.info("Resolving prompt variable: [[%s]]", name)
 
-        # This is a dynamic prompt; resolve its dependencies and call the LLM.
-        prompt = template
-        for dep in dependencies:
-            if dep not in resolved_values:
-                logger.error(f"Could not find value for dependency [[{dep}]]", extra={'missing_dependency': dep, 'current_node': name})
-                return None
-            prompt = prompt.replace(f"[[{dep}]]", resolved_values[dep])
+        # Resolve the prompt's dependencies and call the LLM.
+        prompt = fill_template(name, definitions[name], resolved_values)
+        if prompt is None:
+            return None
 
-        result = call_llm(client, prompt)
+        async with request_slots:
+            result = await call_llm_async(client, prompt)
         if result is None:
-            logger.error(f"Failed to resolve [[{name}]]. Aborting.", extra={'failed_node': name})
+            logger.error("Failed to resolve [[%s]]. Aborting.", name, extra={'failed_node': name})
             return None
 
-        log_entry = (
-            f"--- Step: [[{name}]] ---\n\n"
-            f"PROMPT SENT TO LLM:\n---\n{prompt}\n---\n\n"
-            f"RESPONSE RECEIVED:\n---\n{result}\n---\n"
-        )
-        return name, result, log_entry
+        return name, result, (name, prompt, result)
 
-    # Process each group in sequence, but prompts within each group in parallel
+    # Process each group in sequence, but prompts within each group concurrently
     for group in parallel_groups:
-        if len(group) == 1:
-            # Single prompt - no need for parallel processing
-            result = process_single_prompt(group[0])
-            if result is None:
-                return None
-            name, value, log_entry = result
+        group = [name for name in group if name not in statics]
+        if not group:
+            continue
+        if len(group) > 1:
+            logger.info("Executing %s prompts in parallel: %s", len(group), group)
+
+        # gather() returns results in submission order, which keeps the log stable
+        group_results = await asyncio.gather(
+            *(process_single_prompt(name) for name in group)
+        )
+        if any(result is None for result in group_results):
+            return None
+
+        # Update resolved values and log entries
+        for name, value, log_entry in group_results:
             resolved_values[name] = value
             log_entries.append(log_entry)
-        else:
-            # Multiple prompts - execute in parallel
-            logger.info(f"Executing {len(group)} prompts in parallel: {group}")
-            
-            # Use the smaller of max_workers or group size to avoid unnecessary threads
-            workers_for_group = min(max_workers, len(group))
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers_for_group) as executor:
-                # Submit all prompts in the group
-                future_to_name = {
-                    executor.submit(process_single_prompt, name): name 
-                    for name in group
-                }
-                
-                # Collect results
-                group_results = []
-                for future in concurrent.futures.as_completed(future_to_name):
-                    result = future.result()
-                    if result is None:
-                        return None
-                    group_results.append(result)
-                
-                # Sort results by original order for consistent logging
-                group_results.sort(key=lambda x: group.index(x[0]))
-                
-                # Update resolved values and log entries
-                for name, value, log_entry in group_results:
-                    resolved_values[name] = value
-                    log_entries.append(log_entry)
-
-    final_output = resolved_values.get("output", "Error: Final output not generated.")
-    full_log = "\n\n====================\n\n".join(log_entries)
+
+    final_output = resolved_values.get("output")
+    if final_output is None:
+        final_output = "Error: Final output not generated."
+    full_log = render_execution_log(log_entries)
 
     return final_output, full_log
 
 
+async def run_parallel_chain(client: AsyncOpenAI, *args, **kwargs) -> tuple[str, str] | None:
+    """
+    Runs execute_prompt_chain_parallel with one client for the whole chain.
+
+    The client's connection pool is opened once, reused by every group, and
+    closed on the same event loop once the chain finishes.
+
+    Args:
+        client: The async OpenAI client.
+        *args, **kwargs: Passed through to execute_prompt_chain_parallel.
+
+    Returns:
+        Whatever execute_prompt_chain_parallel returns.
+    """
+    async with client:
+        return await execute_prompt_chain_parallel(client, *args, **kwargs)
+
+
 def execute_prompt_chain(
     client: OpenAI,
     order: List[str],
     definitions: Dict[str, str],
-    graph: Dict[str, List[str]],
     initial_input: str,
+    statics: Dict[str, str],
 ) -> tuple[str, str] | None:
     """
     Executes the planned prompt chain step-by-step (sequential fallback).
@@ -182,56 +419,45 @@ def execute_prompt_chain(
         client: The OpenAI client.
         order: The list of variable names in the correct execution order.
         definitions: The dictionary mapping variable names to their templates.
-        graph: The dependency graph for the prompts.
         initial_input: The initial text to start the chain with.
+        statics: Variables without dependencies, mapped to their content. These
+            are resolved up front instead of inside the loop.
 
     Returns:
         A tuple containing the final output string and the full log string,
         or None if the process fails.
     """
-    resolved_values = {INPUT_NODE_NAME: initial_input}
+    # Presize with every known variable so later assignments never resize the dict
+    resolved_values = dict.fromkeys(definitions, None)
+    resolved_values[INPUT_NODE_NAME] = initial_input
     log_entries = []
 
+    # Static variables never call the LLM, so resolve them before the loop
+    resolved_values.update(statics)
+    log_entries.extend((name, None, content) for name, content in statics.items())
+
     for name in order:
-        logger.info(f"Resolving prompt variable: [[{name}]]")
-
-        template = definitions[name]
-        dependencies = graph.get(name, [])
-
-        # If a node has no dependencies, treat it as a static variable
-        # and do not call the LLM.
-        if not dependencies:
-            logger.debug(f"Node '[[{name}]]' is static. Using its content directly.")
-            result = template
-            resolved_values[name] = result
-            log_entries.append(
-                f"--- Step: [[{name}]] (Static) ---\n\n"
-                f"CONTENT USED DIRECTLY:\n---\n{result}\n---\n"
-            )
+        if name in statics:
             continue
+        logger.info("Resolving prompt variable: [[%s]]", name)
 
-        # This is a dynamic prompt; resolve its dependencies and call the LLM.
-        prompt = template
-        for dep in dependencies:
-            if dep not in resolved_values:
-                logger.error(f"Could not find value for dependency [[{dep}]]", extra={'missing_dependency': dep, 'current_node': name})
-                return None
-            prompt = prompt.replace(f"[[{dep}]]", resolved_values[dep])
+        # Resolve the prompt's dependencies and call the LLM.
+        prompt = fill_template(name, definitions[name], resolved_values)
+        if prompt is None:
+            return None
 
         result = call_llm(client, prompt)
         if result is None:
-            logger.error(f"Failed to resolve [[{name}]]. Aborting.", extra={'failed_node': name})
+            logger.error("Failed to resolve [[%s]]. Aborting.", name, extra={'failed_node': name})
             return None
 
         resolved_values[name] = result
-        log_entries.append(
-            f"--- Step: [[{name}]] ---\n\n"
-            f"PROMPT SENT TO LLM:\n---\n{prompt}\n---\n\n"
-            f"RESPONSE RECEIVED:\n---\n{result}\n---\n"
-        )
+        log_entries.append((name, prompt, result))
 
-    final_output = resolved_values.get("output", "Error: Final output not generated.")
-    full_log = "\n\n====================\n\n".join(log_entries)
+    final_output = resolved_values.get("output")
+    if final_output is None:
+        final_output = "Error: Final output not generated."
+    full_log = render_execution_log(log_entries)
 
     return final_output, full_log
 
@@ -254,7 +480,8 @@ def main():
     parser.add_argument("--json-logs", action="store_true", help="Use JSON format for file logs")
     parser.add_argument("--no-console", action="store_true", help="Disable console output")
     parser.add_argument("--no-parallel", action="store_true", help="Disable parallel execution (use sequential)")
-    parser.add_argument("--max-workers", type=int, help="Maximum number of worker threads for parallel execution (default: 2x CPU cores)")
+    parser.add_argument("--max-workers", type=int, help="Maximum number of concurrent LLM requests for parallel execution (default: 2x CPU cores)")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-parse the prompt file instead of using the plan cache")
     args = parser.parse_args()
     
     # Set up logging based on command line arguments
@@ -278,11 +505,20 @@ def main():
         logger.critical("The OPENAI_API_KEY environment variable is not set.")
         sys.exit(1)
 
-    client = OpenAI(api_key=api_key)
+    # The parallel executor drives its requests from an asyncio event loop.
+    # Either way, size the connection pool to the number of in-flight requests.
+    if args.no_parallel:
+        client = OpenAI(api_key=api_key, http_client=build_http_client(1))
+    else:
+        max_workers = args.max_workers or multiprocessing.cpu_count() * 2
+        client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=build_http_client(max_workers, asynchronous=True),
+        )
 
     try:
-        prompt_content = prompt_file_path.read_text(encoding='utf-8')
-        input_content = input_file_path.read_text(encoding='utf-8')
+        prompt_content = read_text_file(prompt_file_path)
+        input_content = read_text_file(input_file_path)
         logger.info("Successfully loaded input files", extra={
             'prompt_file': str(prompt_file_path),
             'input_file': str(input_file_path),
@@ -290,43 +526,59 @@ def main():
             'input_size': len(input_content)
         })
     except FileNotFoundError as e:
-        logger.critical(f"Could not find a file - {e}", exc_info=True)
+        logger.critical("Could not find a file - %s", e, exc_info=True)
         sys.exit(1)
 
     # --- 2. Parsing and Dependency Resolution ---
-    logger.info("Parsing prompt file and resolving dependencies...")
-    definitions = parse_prompt_file(prompt_content)
-    graph = build_dependency_graph(definitions)
-    logger.debug("Dependency analysis complete", extra={
-        'num_definitions': len(definitions),
-        'definitions': list(definitions.keys())
-    })
-
-    if args.debug:
+    plan = None if args.no_cache else load_cached_plan(prompt_content)
+    if plan is not None:
+        logger.info("Loaded parsed prompt chain from cache")
+        definitions, graph, execution_order, parallel_groups = plan
+    else:
+        logger.info("Parsing prompt file and resolving dependencies...")
+        definitions, graph = parse_prompt_chain(prompt_content)
+
+        try:
+            # One analysis gives both the sequential order and the groups.
+            execution_order, depths = analyze(graph)
+            parallel_groups = group_by_depth(depths)
+        except ValueError as e:
+            logger.critical("Error resolving execution order: %s", e, exc_info=True)
+            sys.exit(1)
+
+        if not args.no_cache:
+            save_cached_plan(prompt_content, (definitions, graph, execution_order, parallel_groups))
+
+    logger.info("Execution order determined", extra={'execution_order': execution_order})
+
+    # Only build the debug payloads when DEBUG records will actually be emitted.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Dependency analysis complete", extra={
+            'num_definitions': len(definitions),
+            'definitions': list(definitions.keys())
+        })
         logger.debug("Parsed prompt definitions:", extra={'definitions': {name: text[:100] + '...' if len(text) > 100 else text for name, text in definitions.items()}})
         logger.debug("Dependency graph:", extra={'dependencies': graph})
 
-    try:
-        execution_order = resolve_execution_order(graph)
-        logger.info("Execution order determined", extra={'execution_order': execution_order})
-    except ValueError as e:
-        logger.critical(f"Error resolving execution order: {e}", exc_info=True)
-        sys.exit(1)
-
     # --- 3. Executing the Chain ---
+    # Variables with no dependencies are static: their content is used directly
+    scheduled = execution_order if args.no_parallel else [name for group in parallel_groups for name in group]
+    statics = {name: definitions[name] for name in scheduled if not graph[name]}
+    if statics and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Static nodes %s will use their content directly.", list(statics))
+
     if args.no_parallel:
         logger.info("Using sequential execution mode")
         results = execute_prompt_chain(
-            client, execution_order, definitions, graph, input_content
+            client, execution_order, definitions, input_content, statics
         )
     else:
         # Use parallel execution
-        parallel_groups = find_parallel_groups(graph)
-        logger.info(f"Using parallel execution mode with {len(parallel_groups)} groups", 
+        logger.info("Using parallel execution mode with %s groups", len(parallel_groups), 
                    extra={'parallel_groups': parallel_groups})
-        results = execute_prompt_chain_parallel(
-            client, parallel_groups, definitions, graph, input_content, args.max_workers
-        )
+        results = asyncio.run(run_parallel_chain(
+            client, parallel_groups, definitions, input_content, statics, max_workers
+        ))
 
     if results is None:
         logger.critical("Processing failed. No output files will be written.")
@@ -340,8 +592,9 @@ def main():
     output_filename = f"{timestamp}_{input_file_path.name}_output.txt"
 
     try:
-        Path(log_filename).write_text(full_log, encoding='utf-8')
-        Path(output_filename).write_text(final_output, encoding='utf-8')
+        # Encode once and write the bytes directly (no text-layer re-encoding)
+        Path(log_filename).write_bytes(full_log.encode('utf-8'))
+        Path(output_filename).write_bytes(final_output.encode('utf-8'))
 
         logger.info("Processing completed successfully", extra={
             'execution_log_file': log_filename,
@@ -351,6 +604,7 @@ def main():
         
         # Also print to console for user visibility
         if not args.no_console:
+            flush_logging(logger)
             print("\n===================================")
             print("        PROCESSING COMPLETE")
             print("===================================\n")
@@ -358,7 +612,7 @@ def main():
             print(f"Final output written to: {output_filename}")
 
     except IOError as e:
-        logger.critical(f"Error writing output files: {e}", exc_info=True)
+        logger.critical("Error writing output files: %s", e, exc_info=True)
         sys.exit(1)
 
 
@@ -0,0 +1,68 @@
+# test_logging_config.py
+import logging
+import os
+import tempfile
+import unittest
+
+from logging_config import BufferedRotatingFileHandler, ColoredConsoleFormatter
+
+
+def make_record(level=logging.INFO, msg='hello %s', args=('world',)):
+    return logging.LogRecord('prmptr', level, __file__, 1, msg, args, None)
+
+
+class ColoredConsoleFormatterTest(unittest.TestCase):
+    def test_colors_level_without_touching_record(self):
+        formatter = ColoredConsoleFormatter('%(levelname)s - %(message)s')
+        record = make_record()
+        self.assertEqual(formatter.format(record), '\033[32mINFO\033[0m - hello world')
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(logging.Formatter('%(levelname)s').format(record), 'INFO')
+
+    def test_brace_style(self):
+        formatter = ColoredConsoleFormatter('{levelname}: {message}', style='{')
+        self.assertEqual(formatter.format(make_record(logging.ERROR)), '\033[31mERROR\033[0m: hello world')
+
+    def test_plain_when_color_disabled(self):
+        formatter = ColoredConsoleFormatter('%(levelname)s - %(message)s', use_color=False)
+        self.assertEqual(formatter.format(make_record()), 'INFO - hello world')
+
+
+class BufferedRotatingFileHandlerTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'test.log')
+
+    def make_handler(self, max_bytes):
+        handler = BufferedRotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=3, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_rolls_over_on_encoded_bytes(self):
+        # Each line is 6 characters but 11 bytes in UTF-8
+        message = '\u00e9' * 5
+        handler = self.make_handler(max_bytes=20)
+        for _ in range(3):
+            handler.handle(make_record(msg=message, args=()))
+        handler.close()
+        for path in (self.path, self.path + '.1', self.path + '.2'):
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), (message + '\n').encode('utf-8'))
+
+    def test_counts_existing_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 15)
+        handler = self.make_handler(max_bytes=20)
+        handler.handle(make_record(msg='abcdef', args=()))
+        handler.close()
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'abcdef\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# test_prmptr.py
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import prmptr
+from logging_config import get_logger
+
+
+class FillTemplateTest(unittest.TestCase):
+    def setUp(self):
+        # main() normally sets up the module logger
+        patcher = mock.patch.object(prmptr, 'logger', get_logger(), create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fills_every_placeholder(self):
+        values = {'input': 'text', 'summary': 'short'}
+        self.assertEqual(
+            prmptr.fill_template('output', '[[summary]] of [[input]], again [[summary]]', values),
+            'short of text, again short',
+        )
+
+    def test_placeholder_in_a_value_is_not_expanded(self):
+        values = {'a': 'see [[b]]', 'b': 'never used'}
+        self.assertEqual(prmptr.fill_template('output', 'x [[a]] y', values), 'x see [[b]] y')
+
+    def test_missing_dependency(self):
+        with self.assertLogs('prmptr', 'ERROR'):
+            self.assertIsNone(prmptr.fill_template('output', '[[a]] [[gone]]', {'a': '1'}))
+
+    def test_unresolved_dependency(self):
+        with self.assertLogs('prmptr', 'ERROR'):
+            self.assertIsNone(prmptr.fill_template('output', '[[a]]', {'a': None}))
+
+
+class PlanCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+        for name, value in (('PLAN_CACHE_DIR', self.cache_dir), ('PLAN_CACHE_MAX_ENTRIES', 2)):
+            patcher = mock.patch.object(prmptr, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def age(self, prompt_content, seconds):
+        path = prmptr._plan_cache_path(prompt_content)
+        mtime = path.stat().st_mtime - seconds
+        os.utime(path, (mtime, mtime))
+
+    def test_round_trip(self):
+        plan = ({'output': 'x'}, {'output': []}, ['output'], [['output']])
+        self.assertIsNone(prmptr.load_cached_plan('chain'))
+        prmptr.save_cached_plan('chain', plan)
+        self.assertEqual(prmptr.load_cached_plan('chain'), plan)
+        self.assertIsNone(prmptr.load_cached_plan('other chain'))
+
+    def test_prunes_least_recently_used(self):
+        prmptr.save_cached_plan('a', 'plan a')
+        prmptr.save_cached_plan('b', 'plan b')
+        self.age('a', 200)
+        self.age('b', 100)
+        # Loading 'a' marks it as used, so 'b' is now the oldest
+        self.assertEqual(prmptr.load_cached_plan('a'), 'plan a')
+        prmptr.save_cached_plan('c', 'plan c')
+        self.assertEqual(len(list(self.cache_dir.glob('*.pkl'))), 2)
+        self.assertEqual(prmptr.load_cached_plan('a'), 'plan a')
+        self.assertIsNone(prmptr.load_cached_plan('b'))
+        self.assertEqual(prmptr.load_cached_plan('c'), 'plan c')
+
+
+if __name__ == '__main__':
+    unittest.main()
